@@ -1,80 +1,87 @@
 """
 Bluetooth Low Energy HID Profile (HoGP) for exposing laptop as keyboard/mouse to iPad.
 
-Uses BlueZ D-Bus API directly for proper GATT service structure that iOS requires.
+Uses BlueZ D-Bus API directly (via dbus-fast on the asyncio loop) for proper
+GATT service structure that iOS requires.
 """
 
 import asyncio
-import dbus
-import dbus.service
-import dbus.mainloop.glib
-from gi.repository import GLib
+import logging
+import os
+import signal
 import struct
-import threading
 
+from dbus_fast import BusType, DBusError, Message, MessageType, PropertyAccess, Variant
+from dbus_fast.aio import MessageBus
+from dbus_fast.service import ServiceInterface, dbus_property, method
+
+# D-Bus callbacks log through here (lazily formatted) rather than printing
+log = logging.getLogger(__name__)
 
 # HID Report Descriptor for keyboard + mouse combo
-HID_REPORT_MAP = bytes([
+HID_REPORT_MAP = (
     # Keyboard (Report ID 1)
-    0x05, 0x01,        # Usage Page (Generic Desktop)
-    0x09, 0x06,        # Usage (Keyboard)
-    0xA1, 0x01,        # Collection (Application)
-    0x85, 0x01,        #   Report ID (1)
-    0x05, 0x07,        #   Usage Page (Key Codes)
-    0x19, 0xE0,        #   Usage Minimum (224)
-    0x29, 0xE7,        #   Usage Maximum (231)
-    0x15, 0x00,        #   Logical Minimum (0)
-    0x25, 0x01,        #   Logical Maximum (1)
-    0x75, 0x01,        #   Report Size (1)
-    0x95, 0x08,        #   Report Count (8)
-    0x81, 0x02,        #   Input (Data, Variable, Absolute)
-    0x95, 0x01,        #   Report Count (1)
-    0x75, 0x08,        #   Report Size (8)
-    0x81, 0x01,        #   Input (Constant)
-    0x95, 0x06,        #   Report Count (6)
-    0x75, 0x08,        #   Report Size (8)
-    0x15, 0x00,        #   Logical Minimum (0)
-    0x25, 0x65,        #   Logical Maximum (101)
-    0x05, 0x07,        #   Usage Page (Key Codes)
-    0x19, 0x00,        #   Usage Minimum (0)
-    0x29, 0x65,        #   Usage Maximum (101)
-    0x81, 0x00,        #   Input (Data, Array)
-    0xC0,              # End Collection
+    b'\x05\x01'        # Usage Page (Generic Desktop)
+    b'\x09\x06'        # Usage (Keyboard)
+    b'\xA1\x01'        # Collection (Application)
+    b'\x85\x01'        #   Report ID (1)
+    b'\x05\x07'        #   Usage Page (Key Codes)
+    b'\x19\xE0'        #   Usage Minimum (224)
+    b'\x29\xE7'        #   Usage Maximum (231)
+    b'\x15\x00'        #   Logical Minimum (0)
+    b'\x25\x01'        #   Logical Maximum (1)
+    b'\x75\x01'        #   Report Size (1)
+    b'\x95\x08'        #   Report Count (8)
+    b'\x81\x02'        #   Input (Data, Variable, Absolute)
+    b'\x95\x01'        #   Report Count (1)
+    b'\x75\x08'        #   Report Size (8)
+    b'\x81\x01'        #   Input (Constant)
+    b'\x95\x06'        #   Report Count (6)
+    b'\x75\x08'        #   Report Size (8)
+    b'\x15\x00'        #   Logical Minimum (0)
+    b'\x25\x65'        #   Logical Maximum (101)
+    b'\x05\x07'        #   Usage Page (Key Codes)
+    b'\x19\x00'        #   Usage Minimum (0)
+    b'\x29\x65'        #   Usage Maximum (101)
+    b'\x81\x00'        #   Input (Data, Array)
+    b'\xC0'            # End Collection
 
     # Mouse (Report ID 2)
-    0x05, 0x01,        # Usage Page (Generic Desktop)
-    0x09, 0x02,        # Usage (Mouse)
-    0xA1, 0x01,        # Collection (Application)
-    0x85, 0x02,        #   Report ID (2)
-    0x09, 0x01,        #   Usage (Pointer)
-    0xA1, 0x00,        #   Collection (Physical)
-    0x05, 0x09,        #     Usage Page (Buttons)
-    0x19, 0x01,        #     Usage Minimum (1)
-    0x29, 0x03,        #     Usage Maximum (3)
-    0x15, 0x00,        #     Logical Minimum (0)
-    0x25, 0x01,        #     Logical Maximum (1)
-    0x95, 0x03,        #     Report Count (3)
-    0x75, 0x01,        #     Report Size (1)
-    0x81, 0x02,        #     Input (Data, Variable, Absolute)
-    0x95, 0x01,        #     Report Count (1)
-    0x75, 0x05,        #     Report Size (5)
-    0x81, 0x01,        #     Input (Constant)
-    0x05, 0x01,        #     Usage Page (Generic Desktop)
-    0x09, 0x30,        #     Usage (X)
-    0x09, 0x31,        #     Usage (Y)
-    0x09, 0x38,        #     Usage (Wheel)
-    0x15, 0x81,        #     Logical Minimum (-127)
-    0x25, 0x7F,        #     Logical Maximum (127)
-    0x75, 0x08,        #     Report Size (8)
-    0x95, 0x03,        #     Report Count (3)
-    0x81, 0x06,        #     Input (Data, Variable, Relative)
-    0xC0,              #   End Collection
-    0xC0,              # End Collection
-])
+    b'\x05\x01'        # Usage Page (Generic Desktop)
+    b'\x09\x02'        # Usage (Mouse)
+    b'\xA1\x01'        # Collection (Application)
+    b'\x85\x02'        #   Report ID (2)
+    b'\x09\x01'        #   Usage (Pointer)
+    b'\xA1\x00'        #   Collection (Physical)
+    b'\x05\x09'        #     Usage Page (Buttons)
+    b'\x19\x01'        #     Usage Minimum (1)
+    b'\x29\x03'        #     Usage Maximum (3)
+    b'\x15\x00'        #     Logical Minimum (0)
+    b'\x25\x01'        #     Logical Maximum (1)
+    b'\x95\x03'        #     Report Count (3)
+    b'\x75\x01'        #     Report Size (1)
+    b'\x81\x02'        #     Input (Data, Variable, Absolute)
+    b'\x95\x01'        #     Report Count (1)
+    b'\x75\x05'        #     Report Size (5)
+    b'\x81\x01'        #     Input (Constant)
+    b'\x05\x01'        #     Usage Page (Generic Desktop)
+    b'\x09\x30'        #     Usage (X)
+    b'\x09\x31'        #     Usage (Y)
+    b'\x09\x38'        #     Usage (Wheel)
+    b'\x15\x81'        #     Logical Minimum (-127)
+    b'\x25\x7F'        #     Logical Maximum (127)
+    b'\x75\x08'        #     Report Size (8)
+    b'\x95\x03'        #     Report Count (3)
+    b'\x81\x06'        #     Input (Data, Variable, Relative)
+    b'\xC0'            #   End Collection
+    b'\xC0'            # End Collection
+)
 
 DBUS_OM_IFACE = 'org.freedesktop.DBus.ObjectManager'
 DBUS_PROP_IFACE = 'org.freedesktop.DBus.Properties'
 BLUEZ_SERVICE = 'org.bluez'
+ADAPTER_IFACE = 'org.bluez.Adapter1'
+DEFAULT_ADAPTER_PATH = '/org/bluez/hci0'
 LE_ADVERTISING_MANAGER_IFACE = 'org.bluez.LEAdvertisingManager1'
 LE_ADVERTISEMENT_IFACE = 'org.bluez.LEAdvertisement1'
 GATT_MANAGER_IFACE = 'org.bluez.GattManager1'
@@ -84,312 +91,411 @@ GATT_DESC_IFACE = 'org.bluez.GattDescriptor1'
 AGENT_IFACE = 'org.bluez.Agent1'
 AGENT_MANAGER_IFACE = 'org.bluez.AgentManager1'
 
+# Input report layouts: keyboard is modifiers + reserved + 6 keys ('6s'
+# zero-pads/truncates the key array), mouse is buttons + X + Y + wheel
+_KB_STRUCT = struct.Struct('<BB6s')
+_MS_STRUCT = struct.Struct('<Bbbb')
+
+# Shared GATT flag lists and the few constant Variants, so objects and their
+# cached property dicts reference one instance instead of building their own
+FLAGS_READ = ['read']
+FLAGS_READ_NOTIFY = ['read', 'notify']
+FLAGS_READ_WRITE = ['read', 'write']
+FLAGS_READ_WRITE_NR = ['read', 'write-without-response']
+FLAGS_WRITE_NR = ['write-without-response']
+_FLAG_VARIANTS = {
+    tuple(f): Variant('as', f)
+    for f in (FLAGS_READ, FLAGS_READ_NOTIFY, FLAGS_READ_WRITE, FLAGS_READ_WRITE_NR, FLAGS_WRITE_NR)
+}
+# Errors BlueZ returns when the configured adapter object doesn't exist
+_NO_SUCH_ADAPTER_ERRORS = (
+    'org.freedesktop.DBus.Error.UnknownObject',
+    'org.freedesktop.DBus.Error.UnknownMethod',
+)
+
+
+def _is_missing_adapter(result):
+    """True if a call's result is an error saying the adapter (interface) isn't there."""
+    return isinstance(result, DBusError) and result.type in _NO_SUCH_ADAPTER_ERRORS
+
+
+_TRUE = Variant('b', True)
+_FALSE = Variant('b', False)
+HID_SERVICE_UUIDS = ['1812']
 
-class PairingAgent(dbus.service.Object):
+
+def _flags_variant(flags):
+    variant = _FLAG_VARIANTS.get(tuple(flags))
+    return variant if variant is not None else Variant('as', flags)
+
+
+class PairingAgent(ServiceInterface):
     """Pairing agent that accepts all pairing requests."""
     PATH = '/org/bluez/hid/agent'
 
-    def __init__(self, bus):
-        dbus.service.Object.__init__(self, bus, self.PATH)
+    def __init__(self):
+        super().__init__(AGENT_IFACE)
 
-    @dbus.service.method(AGENT_IFACE, in_signature='', out_signature='')
+    @method()
     def Release(self):
-        print("Agent released")
+        log.debug("Agent released")
 
-    @dbus.service.method(AGENT_IFACE, in_signature='os', out_signature='')
-    def AuthorizeService(self, device, uuid):
-        print(f"AuthorizeService: {device} {uuid}")
+    @method()
+    def AuthorizeService(self, device: 'o', uuid: 's'):
+        log.debug("AuthorizeService: %s %s", device, uuid)
 
-    @dbus.service.method(AGENT_IFACE, in_signature='o', out_signature='s')
-    def RequestPinCode(self, device):
-        print(f"RequestPinCode: {device}")
+    @method()
+    def RequestPinCode(self, device: 'o') -> 's':
+        log.debug("RequestPinCode: %s", device)
         return "0000"
 
-    @dbus.service.method(AGENT_IFACE, in_signature='o', out_signature='u')
-    def RequestPasskey(self, device):
-        print(f"RequestPasskey: {device}")
-        return dbus.UInt32(0)
+    @method()
+    def RequestPasskey(self, device: 'o') -> 'u':
+        log.debug("RequestPasskey: %s", device)
+        return 0
 
-    @dbus.service.method(AGENT_IFACE, in_signature='ouq', out_signature='')
-    def DisplayPasskey(self, device, passkey, entered):
+    @method()
+    def DisplayPasskey(self, device: 'o', passkey: 'u', entered: 'q'):
         print(f"DisplayPasskey: {device} {passkey:06d} entered={entered}")
 
-    @dbus.service.method(AGENT_IFACE, in_signature='os', out_signature='')
-    def DisplayPinCode(self, device, pincode):
+    @method()
+    def DisplayPinCode(self, device: 'o', pincode: 's'):
         print(f"DisplayPinCode: {device} {pincode}")
 
-    @dbus.service.method(AGENT_IFACE, in_signature='ou', out_signature='')
-    def RequestConfirmation(self, device, passkey):
-        print(f"RequestConfirmation: {device} {passkey:06d} - auto-accepting")
+    @method()
+    def RequestConfirmation(self, device: 'o', passkey: 'u'):
+        log.debug("RequestConfirmation: %s %06d - auto-accepting", device, passkey)
 
-    @dbus.service.method(AGENT_IFACE, in_signature='o', out_signature='')
-    def RequestAuthorization(self, device):
-        print(f"RequestAuthorization: {device} - auto-accepting")
+    @method()
+    def RequestAuthorization(self, device: 'o'):
+        log.debug("RequestAuthorization: %s - auto-accepting", device)
 
-    @dbus.service.method(AGENT_IFACE, in_signature='', out_signature='')
+    @method()
     def Cancel(self):
-        print("Pairing cancelled")
+        log.debug("Pairing cancelled")
 
 
-class Advertisement(dbus.service.Object):
+class Advertisement(ServiceInterface):
     PATH_BASE = '/org/bluez/hid/advertisement'
+    __slots__ = ('path', 'ad_type', 'local_name', 'appearance', 'service_uuids', 'discoverable')
 
-    def __init__(self, bus, index, device_name):
+    def __init__(self, index, device_name):
         self.path = f'{self.PATH_BASE}{index}'
-        self.bus = bus
         self.ad_type = 'peripheral'
         self.local_name = device_name
         # Appearance: 0x03C1 = Keyboard, 0x03C2 = Mouse, 0x03C0 = HID Generic
         self.appearance = 0x03C1  # Keyboard
-        self.service_uuids = ['1812']  # HID Service
+        self.service_uuids = HID_SERVICE_UUIDS
         self.discoverable = True
-        dbus.service.Object.__init__(self, bus, self.path)
-
-    def get_properties(self):
-        properties = {
-            LE_ADVERTISEMENT_IFACE: {
-                'Type': self.ad_type,
-                'LocalName': dbus.String(self.local_name),
-                'Appearance': dbus.UInt16(self.appearance),
-                'ServiceUUIDs': dbus.Array(self.service_uuids, signature='s'),
-                'Discoverable': dbus.Boolean(self.discoverable),
-            }
-        }
-        return properties
+        super().__init__(LE_ADVERTISEMENT_IFACE)
 
     def get_path(self):
-        return dbus.ObjectPath(self.path)
+        return self.path
+
+    @dbus_property(access=PropertyAccess.READ, name='Type')
+    def _type(self) -> 's':
+        return self.ad_type
+
+    @dbus_property(access=PropertyAccess.READ, name='LocalName')
+    def _local_name(self) -> 's':
+        return self.local_name
+
+    @dbus_property(access=PropertyAccess.READ, name='Appearance')
+    def _appearance(self) -> 'q':
+        return self.appearance
 
-    @dbus.service.method(DBUS_PROP_IFACE, in_signature='s', out_signature='a{sv}')
-    def GetAll(self, interface):
-        return self.get_properties()[interface]
+    @dbus_property(access=PropertyAccess.READ, name='ServiceUUIDs')
+    def _service_uuids(self) -> 'as':
+        return self.service_uuids
 
-    @dbus.service.method(LE_ADVERTISEMENT_IFACE, in_signature='', out_signature='')
+    @dbus_property(access=PropertyAccess.READ, name='Discoverable')
+    def _discoverable(self) -> 'b':
+        return self.discoverable
+
+    @method()
     def Release(self):
-        print('Advertisement released')
+        log.debug('Advertisement released')
+
 
+class Characteristic(ServiceInterface):
+    __slots__ = ('path', 'uuid', 'service', 'flags', 'value', 'notifying', 'descriptors',
+                 'bus', '_descriptor_paths', '_props_cache')
 
-class Characteristic(dbus.service.Object):
-    def __init__(self, bus, index, uuid, flags, service):
+    def __init__(self, index, uuid, flags, service):
         self.path = f'{service.path}/char{index}'
-        self.bus = bus
         self.uuid = uuid
         self.service = service
         self.flags = flags
-        self.value = []
+        self.value = b''
         self.notifying = False
         self.descriptors = []
-        dbus.service.Object.__init__(self, bus, self.path)
-
-    def get_properties(self):
-        return {
+        self.bus = None  # set when exported, used to send notifications
+        # Shared with the cached property dict, so add_descriptor just appends
+        self._descriptor_paths = []
+        self._props_cache = {
             GATT_CHRC_IFACE: {
-                'Service': self.service.get_path(),
-                'UUID': self.uuid,
-                'Flags': self.flags,
-                'Descriptors': dbus.Array(
-                    [d.get_path() for d in self.descriptors],
-                    signature='o'
-                ),
+                'Service': Variant('o', service.get_path()),
+                'UUID': Variant('s', uuid),
+                'Flags': _flags_variant(flags),
+                'Descriptors': Variant('ao', self._descriptor_paths),
             }
         }
+        super().__init__(GATT_CHRC_IFACE)
+
+    def get_properties(self):
+        return self._props_cache
 
     def get_path(self):
-        return dbus.ObjectPath(self.path)
+        return self.path
 
     def add_descriptor(self, descriptor):
         self.descriptors.append(descriptor)
+        self._descriptor_paths.append(descriptor.get_path())
+        if self.service.app:
+            self.service.app.invalidate()
+
+    @dbus_property(access=PropertyAccess.READ, name='Service')
+    def _service(self) -> 'o':
+        return self.service.get_path()
+
+    @dbus_property(access=PropertyAccess.READ, name='UUID')
+    def _uuid(self) -> 's':
+        return self.uuid
+
+    @dbus_property(access=PropertyAccess.READ, name='Flags')
+    def _flags(self) -> 'as':
+        return self.flags
+
+    @dbus_property(access=PropertyAccess.READ, name='Descriptors')
+    def _descriptors(self) -> 'ao':
+        return self._descriptor_paths
 
-    @dbus.service.method(DBUS_PROP_IFACE, in_signature='s', out_signature='a{sv}')
-    def GetAll(self, interface):
-        return self.get_properties()[interface]
+    @dbus_property(access=PropertyAccess.READ, name='Value')
+    def _value(self) -> 'ay':
+        return self.value
 
-    @dbus.service.method(GATT_CHRC_IFACE, in_signature='a{sv}', out_signature='ay')
-    def ReadValue(self, options):
+    @method()
+    def ReadValue(self, options: 'a{sv}') -> 'ay':
+        # Long values (the report map) are read in MTU-sized pieces at an offset
+        offset = options.get('offset')
+        if offset is not None and offset.value:
+            return memoryview(self.value)[offset.value:]
         return self.value
 
-    @dbus.service.method(GATT_CHRC_IFACE, in_signature='aya{sv}', out_signature='')
-    def WriteValue(self, value, options):
+    @method()
+    def WriteValue(self, value: 'ay', options: 'a{sv}'):
         self.value = value
 
-    @dbus.service.method(GATT_CHRC_IFACE, in_signature='', out_signature='')
+    @method()
     def StartNotify(self):
         self.notifying = True
 
-    @dbus.service.method(GATT_CHRC_IFACE, in_signature='', out_signature='')
+    @method()
     def StopNotify(self):
         self.notifying = False
 
-    @dbus.service.signal(DBUS_PROP_IFACE, signature='sa{sv}as')
-    def PropertiesChanged(self, interface, changed, invalidated):
-        pass
-
     def notify(self, value):
         if not self.notifying:
             return
         self.value = value
-        self.PropertiesChanged(GATT_CHRC_IFACE, {'Value': dbus.Array(value, signature='y')}, [])
-
-
-class Descriptor(dbus.service.Object):
-    def __init__(self, bus, index, uuid, flags, characteristic):
+        # Build the signal directly: emit_properties_changed rescans every
+        # property and every exported path to find ours on each call
+        self.bus.send(Message.new_signal(
+            self.path, DBUS_PROP_IFACE, 'PropertiesChanged', 'sa{sv}as',
+            [GATT_CHRC_IFACE, {'Value': Variant('ay', value)}, []]
+        )).add_done_callback(self._on_notify_sent)
+
+    def _on_notify_sent(self, future):
+        # Retrieve the error here; left unread, asyncio reports it once per
+        # dropped report when the future is garbage-collected
+        error = None if future.cancelled() else future.exception()
+        if error and self.notifying:
+            log.debug("Notification on %s failed: %s", self.path, error)
+            self.notifying = False
+
+
+class Descriptor(ServiceInterface):
+    __slots__ = ('path', 'uuid', 'flags', 'chrc', 'value', '_props_cache')
+
+    def __init__(self, index, uuid, flags, characteristic):
         self.path = f'{characteristic.path}/desc{index}'
-        self.bus = bus
         self.uuid = uuid
         self.flags = flags
         self.chrc = characteristic
-        self.value = []
-        dbus.service.Object.__init__(self, bus, self.path)
-
-    def get_properties(self):
-        return {
+        self.value = b''
+        self._props_cache = {
             GATT_DESC_IFACE: {
-                'Characteristic': self.chrc.get_path(),
-                'UUID': self.uuid,
-                'Flags': self.flags,
+                'Characteristic': Variant('o', characteristic.get_path()),
+                'UUID': Variant('s', uuid),
+                'Flags': _flags_variant(flags),
             }
         }
+        super().__init__(GATT_DESC_IFACE)
+
+    def get_properties(self):
+        return self._props_cache
 
     def get_path(self):
-        return dbus.ObjectPath(self.path)
+        return self.path
+
+    @dbus_property(access=PropertyAccess.READ, name='Characteristic')
+    def _characteristic(self) -> 'o':
+        return self.chrc.get_path()
+
+    @dbus_property(access=PropertyAccess.READ, name='UUID')
+    def _uuid(self) -> 's':
+        return self.uuid
 
-    @dbus.service.method(DBUS_PROP_IFACE, in_signature='s', out_signature='a{sv}')
-    def GetAll(self, interface):
-        return self.get_properties()[interface]
+    @dbus_property(access=PropertyAccess.READ, name='Flags')
+    def _flags(self) -> 'as':
+        return self.flags
 
-    @dbus.service.method(GATT_DESC_IFACE, in_signature='a{sv}', out_signature='ay')
-    def ReadValue(self, options):
+    @method()
+    def ReadValue(self, options: 'a{sv}') -> 'ay':
         return self.value
 
-    @dbus.service.method(GATT_DESC_IFACE, in_signature='aya{sv}', out_signature='')
-    def WriteValue(self, value, options):
+    @method()
+    def WriteValue(self, value: 'ay', options: 'a{sv}'):
         self.value = value
 
 
 class ReportReferenceDescriptor(Descriptor):
     """Report Reference Descriptor - required for HID Reports."""
     UUID = '2908'
+    __slots__ = ('report_id', 'report_type')
 
-    def __init__(self, bus, index, characteristic, report_id, report_type):
+    def __init__(self, index, characteristic, report_id, report_type):
         # report_type: 1 = Input, 2 = Output, 3 = Feature
         self.report_id = report_id
         self.report_type = report_type
-        super().__init__(bus, index, self.UUID, ['read'], characteristic)
-        self.value = [report_id, report_type]
+        super().__init__(index, self.UUID, FLAGS_READ, characteristic)
+        self.value = bytes((report_id, report_type))
 
 
 class CCCDescriptor(Descriptor):
     """Client Characteristic Configuration Descriptor."""
     UUID = '2902'
+    __slots__ = ()
 
-    def __init__(self, bus, index, characteristic):
-        super().__init__(bus, index, self.UUID, ['read', 'write'], characteristic)
-        self.value = [0x00, 0x00]
-
-    @dbus.service.method(GATT_DESC_IFACE, in_signature='aya{sv}', out_signature='')
-    def WriteValue(self, value, options):
-        self.value = list(value)
-        # Check if notifications enabled (bit 0)
-        if value[0] & 0x01:
-            print(f"Notifications enabled for {self.chrc.uuid}")
-            self.chrc.notifying = True
-        else:
-            print(f"Notifications disabled for {self.chrc.uuid}")
-            self.chrc.notifying = False
+    def __init__(self, index, characteristic):
+        super().__init__(index, self.UUID, FLAGS_READ_WRITE, characteristic)
+        self.value = b'\x00\x00'
+
+    @method()
+    def WriteValue(self, value: 'ay', options: 'a{sv}'):
+        self.value = bytes(value)
+        # Notifications enabled flag is bit 0; only report actual changes
+        notifying = bool(self.value[0] & 0x01)
+        if notifying != self.chrc.notifying:
+            self.chrc.notifying = notifying
+            log.debug("Notifications %s for %s", 'enabled' if notifying else 'disabled', self.chrc.uuid)
 
 
-class Service(dbus.service.Object):
+class Service(ServiceInterface):
     PATH_BASE = '/org/bluez/hid/service'
+    __slots__ = ('path', 'uuid', 'primary', 'characteristics', 'app', '_characteristic_paths',
+                 '_props_cache')
 
-    def __init__(self, bus, index, uuid, primary):
+    def __init__(self, index, uuid, primary):
         self.path = f'{self.PATH_BASE}{index}'
-        self.bus = bus
         self.uuid = uuid
         self.primary = primary
         self.characteristics = []
-        dbus.service.Object.__init__(self, bus, self.path)
-
-    def get_properties(self):
-        return {
+        self.app = None
+        self._characteristic_paths = []
+        self._props_cache = {
             GATT_SERVICE_IFACE: {
-                'UUID': self.uuid,
-                'Primary': self.primary,
-                'Characteristics': dbus.Array(
-                    [c.get_path() for c in self.characteristics],
-                    signature='o'
-                ),
+                'UUID': Variant('s', uuid),
+                'Primary': _TRUE if primary else _FALSE,
+                'Characteristics': Variant('ao', self._characteristic_paths),
             }
         }
+        super().__init__(GATT_SERVICE_IFACE)
+
+    def get_properties(self):
+        return self._props_cache
 
     def get_path(self):
-        return dbus.ObjectPath(self.path)
+        return self.path
 
     def add_characteristic(self, characteristic):
         self.characteristics.append(characteristic)
+        self._characteristic_paths.append(characteristic.get_path())
+        if self.app:
+            self.app.invalidate()
+
+    @dbus_property(access=PropertyAccess.READ, name='UUID')
+    def _uuid(self) -> 's':
+        return self.uuid
 
-    @dbus.service.method(DBUS_PROP_IFACE, in_signature='s', out_signature='a{sv}')
-    def GetAll(self, interface):
-        return self.get_properties()[interface]
+    @dbus_property(access=PropertyAccess.READ, name='Primary')
+    def _primary(self) -> 'b':
+        return self.primary
+
+    @dbus_property(access=PropertyAccess.READ, name='Characteristics')
+    def _characteristics(self) -> 'ao':
+        return self._characteristic_paths
 
 
 class HIDService(Service):
     """HID Service implementation."""
     UUID = '1812'
+    __slots__ = ('keyboard_report', 'mouse_report')
 
-    def __init__(self, bus, index):
-        super().__init__(bus, index, self.UUID, True)
+    def __init__(self, index):
+        super().__init__(index, self.UUID, True)
         self.keyboard_report = None
         self.mouse_report = None
         self._setup_characteristics()
 
     def _setup_characteristics(self):
         # HID Information
-        hid_info = Characteristic(self.bus, 0, '2a4a', ['read'], self)
-        hid_info.value = [0x11, 0x01, 0x00, 0x03]  # HID 1.11, no country, remote wake + normally connectable
+        hid_info = Characteristic(0, '2a4a', FLAGS_READ, self)
+        hid_info.value = b'\x11\x01\x00\x03'  # HID 1.11, no country, remote wake + normally connectable
         self.add_characteristic(hid_info)
 
         # Report Map
-        report_map = Characteristic(self.bus, 1, '2a4b', ['read'], self)
-        report_map.value = list(HID_REPORT_MAP)
+        report_map = Characteristic(1, '2a4b', FLAGS_READ, self)
+        report_map.value = HID_REPORT_MAP
         self.add_characteristic(report_map)
 
         # Protocol Mode
-        protocol_mode = Characteristic(self.bus, 2, '2a4e', ['read', 'write-without-response'], self)
-        protocol_mode.value = [0x01]  # Report Protocol
+        protocol_mode = Characteristic(2, '2a4e', FLAGS_READ_WRITE_NR, self)
+        protocol_mode.value = b'\x01'  # Report Protocol
         self.add_characteristic(protocol_mode)
 
         # HID Control Point
-        control_point = Characteristic(self.bus, 3, '2a4c', ['write-without-response'], self)
-        control_point.value = [0x00]
+        control_point = Characteristic(3, '2a4c', FLAGS_WRITE_NR, self)
+        control_point.value = b'\x00'
         self.add_characteristic(control_point)
 
         # Keyboard Report (Input)
         self.keyboard_report = Characteristic(
-            self.bus, 4, '2a4d',
-            ['read', 'notify'],
+            4, '2a4d',
+            FLAGS_READ_NOTIFY,
             self
         )
-        self.keyboard_report.value = [0x00] * 8
+        self.keyboard_report.value = bytes(8)
         # Add Report Reference Descriptor (Report ID 1, Input)
-        kb_ref = ReportReferenceDescriptor(self.bus, 0, self.keyboard_report, 0x01, 0x01)
+        kb_ref = ReportReferenceDescriptor(0, self.keyboard_report, 0x01, 0x01)
         self.keyboard_report.add_descriptor(kb_ref)
         # Add CCC Descriptor
-        kb_ccc = CCCDescriptor(self.bus, 1, self.keyboard_report)
+        kb_ccc = CCCDescriptor(1, self.keyboard_report)
         self.keyboard_report.add_descriptor(kb_ccc)
         self.add_characteristic(self.keyboard_report)
 
         # Mouse Report (Input)
         self.mouse_report = Characteristic(
-            self.bus, 5, '2a4d',
-            ['read', 'notify'],
+            5, '2a4d',
+            FLAGS_READ_NOTIFY,
             self
         )
-        self.mouse_report.value = [0x00] * 4
+        self.mouse_report.value = bytes(4)
         # Add Report Reference Descriptor (Report ID 2, Input)
-        mouse_ref = ReportReferenceDescriptor(self.bus, 0, self.mouse_report, 0x02, 0x01)
+        mouse_ref = ReportReferenceDescriptor(0, self.mouse_report, 0x02, 0x01)
         self.mouse_report.add_descriptor(mouse_ref)
         # Add CCC Descriptor
-        mouse_ccc = CCCDescriptor(self.bus, 1, self.mouse_report)
+        mouse_ccc = CCCDescriptor(1, self.mouse_report)
         self.mouse_report.add_descriptor(mouse_ccc)
         self.add_characteristic(self.mouse_report)
 
@@ -397,15 +503,16 @@ class HIDService(Service):
 class BatteryService(Service):
     """Battery Service."""
     UUID = '180f'
+    __slots__ = ()
 
-    def __init__(self, bus, index):
-        super().__init__(bus, index, self.UUID, True)
+    def __init__(self, index):
+        super().__init__(index, self.UUID, True)
         self._setup_characteristics()
 
     def _setup_characteristics(self):
-        battery_level = Characteristic(self.bus, 0, '2a19', ['read', 'notify'], self)
-        battery_level.value = [100]  # 100%
-        ccc = CCCDescriptor(self.bus, 0, battery_level)
+        battery_level = Characteristic(0, '2a19', FLAGS_READ_NOTIFY, self)
+        battery_level.value = bytes([100])  # 100%
+        ccc = CCCDescriptor(0, battery_level)
         battery_level.add_descriptor(ccc)
         self.add_characteristic(battery_level)
 
@@ -413,202 +520,348 @@ class BatteryService(Service):
 class DeviceInfoService(Service):
     """Device Information Service."""
     UUID = '180a'
+    __slots__ = ()
 
-    def __init__(self, bus, index):
-        super().__init__(bus, index, self.UUID, True)
+    def __init__(self, index):
+        super().__init__(index, self.UUID, True)
         self._setup_characteristics()
 
     def _setup_characteristics(self):
         # Manufacturer Name
-        mfr = Characteristic(self.bus, 0, '2a29', ['read'], self)
-        mfr.value = list(b'Linux HID')
+        mfr = Characteristic(0, '2a29', FLAGS_READ, self)
+        mfr.value = b'Linux HID'
         self.add_characteristic(mfr)
 
         # PnP ID
-        pnp = Characteristic(self.bus, 1, '2a50', ['read'], self)
+        pnp = Characteristic(1, '2a50', FLAGS_READ, self)
         # Vendor ID Source (USB=2), Vendor ID, Product ID, Version
-        pnp.value = list(struct.pack('<BHHH', 0x02, 0x1234, 0x5678, 0x0100))
+        pnp.value = struct.pack('<BHHH', 0x02, 0x1234, 0x5678, 0x0100)
         self.add_characteristic(pnp)
 
 
-class Application(dbus.service.Object):
-    """GATT Application."""
+class Application:
+    """GATT Application.
+
+    GetManagedObjects is answered from a cached tree by a bus message
+    handler, ahead of dbus-fast's default handler which would re-walk every
+    export and property getter on each call.
+    """
     PATH = '/org/bluez/hid'
 
-    def __init__(self, bus):
+    def __init__(self):
         self.path = self.PATH
         self.services = []
-        dbus.service.Object.__init__(self, bus, self.path)
+        self._managed_cache = None
 
     def get_path(self):
-        return dbus.ObjectPath(self.path)
+        return self.path
 
     def add_service(self, service):
+        service.app = self
         self.services.append(service)
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop the cached GetManagedObjects response."""
+        self._managed_cache = None
+
+    def get_managed_objects(self):
+        if self._managed_cache is None:
+            response = {}
+            for service in self.services:
+                response[service.get_path()] = service.get_properties()
+                for chrc in service.characteristics:
+                    response[chrc.get_path()] = chrc.get_properties()
+                    for desc in chrc.descriptors:
+                        response[desc.get_path()] = desc.get_properties()
+            self._managed_cache = response
+        return self._managed_cache
+
+    def _handle_message(self, msg):
+        if (msg.message_type == MessageType.METHOD_CALL
+                and msg.path == self.path
+                and msg.interface == DBUS_OM_IFACE
+                and msg.member == 'GetManagedObjects'):
+            return Message.new_method_return(msg, 'a{oa{sa{sv}}}', [self.get_managed_objects()])
+        return None
 
-    @dbus.service.method(DBUS_OM_IFACE, out_signature='a{oa{sa{sv}}}')
-    def GetManagedObjects(self):
-        response = {}
+    def export(self, bus):
+        """Export all services, characteristics and descriptors on the bus."""
+        bus.add_message_handler(self._handle_message)
         for service in self.services:
-            response[service.get_path()] = service.get_properties()
+            bus.export(service.get_path(), service)
             for chrc in service.characteristics:
-                response[chrc.get_path()] = chrc.get_properties()
+                bus.export(chrc.get_path(), chrc)
+                chrc.bus = bus
                 for desc in chrc.descriptors:
-                    response[desc.get_path()] = desc.get_properties()
-        return response
+                    bus.export(desc.get_path(), desc)
 
 
 class BLEHIDProfile:
     """BLE HID Profile using BlueZ D-Bus API."""
 
-    def __init__(self, device_name: str = "iPad Remote"):
+    def __init__(self, device_name: str = "iPad Remote", adapter_path: str = None):
         self.device_name = device_name
         self.bus = None
-        self.mainloop = None
         self.app = None
         self.hid_service = None
         self.advertisement = None
         self.agent = None
         self.connected = False
-        self._loop_thread = None
-
-    def _find_adapter(self):
-        """Find the Bluetooth adapter."""
-        remote_om = dbus.Interface(
-            self.bus.get_object(BLUEZ_SERVICE, '/'),
-            DBUS_OM_IFACE
-        )
-        objects = remote_om.GetManagedObjects()
+        self._mouse_pending = None
+        self._mouse_flush_scheduled = False
+        self._last_buttons = 0
+        # Tried first; the object tree is only scanned if it turns out not to exist
+        self._adapter_path = adapter_path or os.environ.get('BLE_ADAPTER', DEFAULT_ADAPTER_PATH)
+        self._stopped = asyncio.Event()
+
+    async def _call(self, path, interface, member, signature='', body=None):
+        """Call a BlueZ method and return the reply body, raising on error."""
+        reply = await self.bus.call(Message(
+            destination=BLUEZ_SERVICE,
+            path=path,
+            interface=interface,
+            member=member,
+            signature=signature,
+            body=body or [],
+        ))
+        if reply.message_type == MessageType.ERROR:
+            raise DBusError(reply.error_name, reply.body[0] if reply.body else '')
+        return reply.body
+
+    async def _find_adapter(self):
+        """Find the Bluetooth adapter (object tree is walked only once)."""
+        if self._adapter_path:
+            return self._adapter_path
+
+        objects, = await self._call('/', DBUS_OM_IFACE, 'GetManagedObjects')
 
         for path, interfaces in objects.items():
             if LE_ADVERTISING_MANAGER_IFACE in interfaces:
-                return path
-        return None
+                self._adapter_path = path
+                break
+        return self._adapter_path
+
+    async def _setup_adapter(self, adapter_path):
+        """Power the adapter, then set the remaining properties together."""
+        # BlueZ refuses Discoverable (NotReady) on an unpowered adapter, so
+        # Powered has to land first; a failure here is fatal
+        await self._call(adapter_path, DBUS_PROP_IFACE, 'Set', 'ssv',
+                         [ADAPTER_IFACE, 'Powered', _TRUE])
+
+        props = (
+            ('Alias', Variant('s', self.device_name)),
+            ('Discoverable', _TRUE),
+            ('Pairable', _TRUE),
+        )
+        results = await asyncio.gather(*(
+            self._call(adapter_path, DBUS_PROP_IFACE, 'Set', 'ssv', [ADAPTER_IFACE, name, value])
+            for name, value in props
+        ), return_exceptions=True)
+
+        for (name, _), result in zip(props, results):
+            if not isinstance(result, Exception):
+                continue
+            # Missing adapter is fatal; the rest are best effort
+            if _is_missing_adapter(result) or not isinstance(result, DBusError):
+                raise result
+            print(f"Failed to set adapter {name}: {result}")
+
+    async def _rescan_adapter(self, failed_path):
+        """Scan for an LE adapter other than failed_path; None if there isn't one."""
+        self._adapter_path = None
+        adapter_path = await self._find_adapter()
+        if adapter_path == failed_path:
+            return None
+        return adapter_path
+
+    def _register_application(self, adapter_path):
+        """Register the GATT application and advertisement together."""
+        return asyncio.gather(
+            self._call(adapter_path, GATT_MANAGER_IFACE, 'RegisterApplication', 'oa{sv}',
+                       [self.app.get_path(), {}]),
+            self._call(adapter_path, LE_ADVERTISING_MANAGER_IFACE, 'RegisterAdvertisement', 'oa{sv}',
+                       [self.advertisement.get_path(), {}]),
+            return_exceptions=True,
+        )
+
+    async def _register_agent(self):
+        await self._call('/org/bluez', AGENT_MANAGER_IFACE, 'RegisterAgent', 'os',
+                         [PairingAgent.PATH, "KeyboardDisplay"])
+        await self._call('/org/bluez', AGENT_MANAGER_IFACE, 'RequestDefaultAgent', 'o',
+                         [PairingAgent.PATH])
 
     async def start(self):
         """Start the BLE HID server."""
         print(f"Starting BLE HID server as '{self.device_name}'...")
 
-        dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
-        self.bus = dbus.SystemBus()
+        # No fd passing (no AcquireNotify/AcquireWrite), so skip UNIX FD negotiation
+        self.bus = await MessageBus(bus_type=BusType.SYSTEM, negotiate_unix_fd=False).connect()
 
-        adapter_path = self._find_adapter()
-        if not adapter_path:
-            raise Exception("No BLE adapter found")
+        adapter_path = await self._find_adapter()
+        try:
+            await self._setup_adapter(adapter_path)
+        except DBusError as e:
+            if e.type not in _NO_SUCH_ADAPTER_ERRORS:
+                raise
+            # Configured adapter isn't there; fall back to scanning for one
+            adapter_path = await self._rescan_adapter(adapter_path)
+            if not adapter_path:
+                raise Exception("No BLE adapter found")
+            await self._setup_adapter(adapter_path)
 
         print(f"Using adapter: {adapter_path}")
 
-        # Set adapter properties
-        adapter_props = dbus.Interface(
-            self.bus.get_object(BLUEZ_SERVICE, adapter_path),
-            DBUS_PROP_IFACE
-        )
-        adapter_props.Set('org.bluez.Adapter1', 'Powered', dbus.Boolean(True))
-        adapter_props.Set('org.bluez.Adapter1', 'Alias', dbus.String(self.device_name))
-        adapter_props.Set('org.bluez.Adapter1', 'Discoverable', dbus.Boolean(True))
-        adapter_props.Set('org.bluez.Adapter1', 'Pairable', dbus.Boolean(True))
-
-        # Register pairing agent
-        self.agent = PairingAgent(self.bus)
-        agent_manager = dbus.Interface(
-            self.bus.get_object(BLUEZ_SERVICE, '/org/bluez'),
-            AGENT_MANAGER_IFACE
-        )
-        try:
-            agent_manager.RegisterAgent(PairingAgent.PATH, "KeyboardDisplay")
-            agent_manager.RequestDefaultAgent(PairingAgent.PATH)
-            print("Pairing agent registered")
-        except Exception as e:
-            print(f"Agent registration: {e}")
+        # Pairing agent
+        self.agent = PairingAgent()
+        self.bus.export(PairingAgent.PATH, self.agent)
 
         # Create application
-        self.app = Application(self.bus)
+        self.app = Application()
 
         # Add services
-        self.hid_service = HIDService(self.bus, 0)
+        self.hid_service = HIDService(0)
         self.app.add_service(self.hid_service)
-        self.app.add_service(DeviceInfoService(self.bus, 1))
-        self.app.add_service(BatteryService(self.bus, 2))
-
-        # Register application
-        gatt_manager = dbus.Interface(
-            self.bus.get_object(BLUEZ_SERVICE, adapter_path),
-            GATT_MANAGER_IFACE
+        self.app.add_service(DeviceInfoService(1))
+        self.app.add_service(BatteryService(2))
+        self.app.export(self.bus)
+
+        # Create advertisement
+        self.advertisement = Advertisement(0, self.device_name)
+        self.bus.export(self.advertisement.get_path(), self.advertisement)
+
+        # Register all three concurrently; each failure is reported on its own
+        agent_result, (app_result, ad_result) = await asyncio.gather(
+            self._register_agent(),
+            self._register_application(adapter_path),
+            return_exceptions=True,
         )
 
-        try:
-            gatt_manager.RegisterApplication(
-                self.app.get_path(),
-                {},
-                reply_handler=lambda: print("GATT application registered"),
-                error_handler=lambda e: print(f"Failed to register GATT: {e}")
-            )
-        except Exception as e:
-            print(f"GATT registration error: {e}")
-
-        # Create and register advertisement
-        self.advertisement = Advertisement(self.bus, 0, self.device_name)
-        ad_manager = dbus.Interface(
-            self.bus.get_object(BLUEZ_SERVICE, adapter_path),
-            LE_ADVERTISING_MANAGER_IFACE
-        )
+        if _is_missing_adapter(app_result) or _is_missing_adapter(ad_result):
+            # Adapter exists but has no GATT manager or LE advertising
+            fallback_path = await self._rescan_adapter(adapter_path)
+            if fallback_path:
+                print(f"{adapter_path} can't serve BLE HID, switching to {fallback_path}")
+                await self._unregister_application(adapter_path, app_result, ad_result)
+                adapter_path = fallback_path
+                await self._setup_adapter(adapter_path)
+                app_result, ad_result = await self._register_application(adapter_path)
+
+        if isinstance(agent_result, Exception):
+            print(f"Agent registration: {agent_result}")
+        else:
+            print("Pairing agent registered")
 
-        try:
-            ad_manager.RegisterAdvertisement(
-                self.advertisement.get_path(),
-                {},
-                reply_handler=lambda: print("Advertisement registered"),
-                error_handler=lambda e: print(f"Failed to register advertisement: {e}")
-            )
-        except Exception as e:
-            print(f"Advertisement registration error: {e}")
-
-        # Start GLib main loop in a thread
-        self.mainloop = GLib.MainLoop()
-        self._loop_thread = threading.Thread(target=self.mainloop.run, daemon=True)
-        self._loop_thread.start()
+        if isinstance(app_result, Exception):
+            print(f"Failed to register GATT: {app_result}")
+        else:
+            print("GATT application registered")
+
+        if isinstance(ad_result, Exception):
+            print(f"Failed to register advertisement: {ad_result}")
+        else:
+            print("Advertisement registered")
 
         self.connected = True
+        # Sends are queued on the bus and never raise; learn about a dropped
+        # bus once here rather than guarding every report
+        asyncio.ensure_future(self.bus.wait_for_disconnect()).add_done_callback(self._on_bus_lost)
         print("BLE HID server started")
 
-    async def send_keyboard_report(self, modifier_keys: int, keys: list):
+    async def _unregister_application(self, adapter_path, app_result, ad_result):
+        """Undo whichever of the two registrations succeeded on adapter_path."""
+        if not isinstance(app_result, Exception):
+            try:
+                await self._call(adapter_path, GATT_MANAGER_IFACE, 'UnregisterApplication', 'o',
+                                 [self.app.get_path()])
+            except DBusError:
+                pass
+        if not isinstance(ad_result, Exception):
+            try:
+                await self._call(adapter_path, LE_ADVERTISING_MANAGER_IFACE, 'UnregisterAdvertisement',
+                                 'o', [self.advertisement.get_path()])
+            except DBusError:
+                pass
+
+    def _on_bus_lost(self, future):
+        error = None if future.cancelled() else future.exception()
+        if self.connected:
+            print(f"D-Bus connection lost: {error}" if error else "D-Bus connection lost")
+        self.connected = False
+
+    async def send_keyboard_report(self, modifier_keys: int, keys: bytes):
         """Send keyboard report via notification."""
-        if not self.hid_service or not self.connected:
-            return
-        if not self.hid_service.keyboard_report.notifying:
+        # Queued mouse input happened first; keep it ahead (e.g. shift-click)
+        self._send_pending_mouse()
+
+        # connected is only set once start() has built hid_service
+        if not self.connected or not self.hid_service.keyboard_report.notifying:
             return
 
-        keys = (keys + [0] * 6)[:6]
-        report = [modifier_keys, 0x00] + keys
+        report = _KB_STRUCT.pack(modifier_keys, 0x00, bytes(keys))
+        if report == self.hid_service.keyboard_report.value:
+            return  # Same key state as last report (e.g. key held down)
 
-        try:
-            self.hid_service.keyboard_report.notify(report)
-        except Exception:
-            pass
+        self.hid_service.keyboard_report.notify(report)
 
     async def send_mouse_report(self, buttons: int, x: int, y: int, wheel: int = 0):
-        """Send mouse report via notification."""
-        if not self.hid_service or not self.connected:
+        """Queue mouse report; reports within one loop iteration are coalesced."""
+        if not self.connected or not self.hid_service.mouse_report.notifying:
+            return  # Not started, or iPad hasn't enabled notifications yet
+
+        pending = self._mouse_pending
+        if pending is not None and pending[0] != buttons:
+            # Button change: send motion so far so the click lands where expected
+            self._send_pending_mouse()
+            pending = None
+
+        if pending is None:
+            self._mouse_pending = (buttons, x, y, wheel)
+        else:
+            self._mouse_pending = (buttons, pending[1] + x, pending[2] + y, pending[3] + wheel)
+
+        if not self._mouse_flush_scheduled:
+            self._mouse_flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush_mouse)
+
+    def _flush_mouse(self):
+        self._mouse_flush_scheduled = False
+        self._send_pending_mouse()
+
+    def _send_pending_mouse(self):
+        """Send accumulated mouse report, split if it exceeds the axis range."""
+        pending = self._mouse_pending
+        if pending is None:
+            return
+        self._mouse_pending = None
+        buttons, x, y, wheel = pending
+        if not (x or y or wheel) and buttons == self._last_buttons:
+            return  # No motion and no button change
+        self._last_buttons = buttons
+        mouse_report = self.hid_service.mouse_report
+
+        if -127 <= x <= 127 and -127 <= y <= 127 and -127 <= wheel <= 127:
+            # Common case: one report, nothing to clamp or split
+            mouse_report.notify(_MS_STRUCT.pack(buttons, x, y, wheel))
             return
-        if not self.hid_service.mouse_report.notifying:
-            return  # iPad hasn't enabled notifications yet
 
-        x = max(-127, min(127, x))
-        y = max(-127, min(127, y))
-        wheel = max(-127, min(127, wheel))
+        while True:
+            cx = -127 if x < -127 else 127 if x > 127 else x
+            cy = -127 if y < -127 else 127 if y > 127 else y
+            cw = -127 if wheel < -127 else 127 if wheel > 127 else wheel
 
-        report = [buttons, x & 0xFF, y & 0xFF, wheel & 0xFF]
+            mouse_report.notify(_MS_STRUCT.pack(buttons, cx, cy, cw))
 
-        try:
-            self.hid_service.mouse_report.notify(report)
-        except Exception:
-            pass
+            x, y, wheel = x - cx, y - cy, wheel - cw
+            if not (x or y or wheel):
+                break
 
     async def stop(self):
         """Stop the BLE server."""
         self.connected = False
-        if self.mainloop:
-            self.mainloop.quit()
+        if self.bus:
+            self.bus.disconnect()
+        self._stopped.set()
         print("BLE HID server stopped")
 
 
@@ -616,6 +869,10 @@ async def main():
     """Test the BLE HID profile."""
     profile = BLEHIDProfile("iPad Remote")
 
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, profile._stopped.set)
+
     try:
         await profile.start()
 
@@ -626,10 +883,8 @@ async def main():
         print("  3. Tap to pair and connect")
         print("\nPress Ctrl+C to exit")
 
-        while True:
-            await asyncio.sleep(1)
-
-    except KeyboardInterrupt:
+        # Sleep until a signal or stop() wakes us; no periodic wakeups
+        await profile._stopped.wait()
         print("\nShutting down...")
     finally:
         await profile.stop()
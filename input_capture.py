@@ -7,25 +7,18 @@ to HID reports that can be sent to the iPad via Bluetooth.
 Uses Xlib directly to avoid evdev dependency.
 """
 
+from collections import deque
 from typing import Callable, Optional
+import os
+import re
+import select
 import threading
 import time
-import ctypes
-import ctypes.util
 
-from Xlib import X, XK, display
+from Xlib import X, XK, Xatom, display, error
 from Xlib.ext import record
 from Xlib.protocol import rq
 
-# Load X11 library for cursor creation
-_xlib = None
-try:
-    _xlib_path = ctypes.util.find_library('X11')
-    if _xlib_path:
-        _xlib = ctypes.CDLL(_xlib_path)
-except Exception:
-    pass
-
 
 # USB HID keyboard usage codes (simplified mapping)
 # Full list: https://usb.org/sites/default/files/hut1_4.pdf
@@ -86,6 +79,25 @@ MODIFIER_KEYSYMS = {
     XK.XK_Meta_R: MODIFIER_RIGHT_GUI,
 }
 
+# Exit hotkey: Ctrl+Alt+Q (left modifiers)
+EXIT_KEYSYMS = frozenset((XK.XK_q, XK.XK_Q))
+EXIT_MODIFIERS = MODIFIER_LEFT_CTRL | MODIFIER_LEFT_ALT
+
+# Events selected on the focused window: focus moving away, or its name/class being set
+FOCUS_WINDOW_EVENTS = X.FocusChangeMask | X.PropertyChangeMask
+
+# X button number -> HID mouse button bit (1 left, 2 middle, 3 right)
+_BUTTON_MASK = (0, 0x01, 0x04, 0x02, 0, 0, 0, 0)
+# X button number -> wheel delta (4 up, 5 down; natural scrolling, so
+# content moves opposite to the wheel)
+_BUTTON_WHEEL = (0, 0, 0, 0, -3, 3, 0, 0)
+
+# After a failed UxPlay window search, don't search again for this long (ns)
+WINDOW_SEARCH_COOLDOWN_NS = 500_000_000
+
+# Stateless parser for the events in a RECORD reply, shared across replies
+_EVENT_FIELD = rq.EventField(None)
+
 # Direct keysym to HID mapping for keys where keysym_to_string may not work
 KEYSYM_TO_HID = {
     XK.XK_Delete: 0x4C,
@@ -107,22 +119,42 @@ KEYSYM_TO_HID = {
 }
 
 
+def _build_keysym_map():
+    """Resolve KEY_CODES names to keysyms once, so lookups are a single dict get."""
+    keysym_map = {}
+    for name, hid_code in KEY_CODES.items():
+        # KEY_CODES uses lowercase names; XK spells them e.g. 'A', 'F1', 'Caps_Lock'
+        for variant in (name, name.upper(), name.capitalize(),
+                        '_'.join(part.capitalize() for part in name.split('_'))):
+            keysym = XK.string_to_keysym(variant)
+            if keysym:
+                keysym_map.setdefault(keysym, hid_code)
+    keysym_map.update(KEYSYM_TO_HID)
+    return keysym_map
+
+
+# All keysym to HID mappings, built at import
+KEYSYM_HID_MAP = _build_keysym_map()
+
+
 class InputCapture:
     """Captures keyboard and mouse input and converts to HID reports."""
 
     # Window name patterns to match for UxPlay (including GStreamer video sinks)
-    UXPLAY_WINDOW_PATTERNS = [
+    UXPLAY_WINDOW_PATTERNS = (
         'uxplay',
         'gst',              # GStreamer windows
         'autovideosink',    # GStreamer auto sink
         'xvimagesink',      # X video image sink
         'ximagesink',       # X image sink
         'glimagesink',      # OpenGL sink
-    ]
+    )
+    # All patterns as one case-insensitive regex, so a name is scanned once
+    _UXPLAY_RE = re.compile('|'.join(map(re.escape, UXPLAY_WINDOW_PATTERNS)), re.IGNORECASE)
 
     def __init__(
         self,
-        keyboard_callback: Callable[[int, list], None],
+        keyboard_callback: Callable[[int, bytes], None],
         mouse_callback: Callable[[int, int, int, int], None],
         capture_region: Optional[tuple] = None,
         require_focus: bool = True
@@ -131,7 +163,8 @@ class InputCapture:
         Initialize input capture.
 
         Args:
-            keyboard_callback: Function to call with (modifier_keys, key_list)
+            keyboard_callback: Function to call with (modifier_keys, keys), keys being
+                the 6-byte HID key array
             mouse_callback: Function to call with (buttons, x, y, wheel)
             capture_region: Optional (x, y, width, height) to limit mouse capture
             require_focus: Only capture when UxPlay window is focused
@@ -147,12 +180,22 @@ class InputCapture:
         self.context = None
 
         self.modifier_state = 0
-        self.pressed_keys = set()
+        self.pressed_keys = bytearray(6)  # HID key slots in press order, 0 = free
         self.mouse_buttons = 0
 
+        # Per-keycode lookups built from the keymap in start()
+        self._keycode_hid = bytes(256)       # HID usage, 0 if unmapped
+        self._keycode_modifier = bytes(256)  # HID modifier bit, 0 if not a modifier
+        self._exit_keycodes = frozenset()    # Keycodes for the exit hotkey letter
+
         self.capturing = False
         self.capture_lock = threading.Lock()
         self.capture_thread = None
+        self.focus_thread = None
+        self._focus_stop = threading.Event()
+        self._focus_wake = None          # (read, write) pipe that wakes the focus thread
+        self._focus_atoms = frozenset()  # PropertyNotify atoms that can change focus state
+        self._watched_window = None      # Focused window we selected FOCUS_WINDOW_EVENTS on
 
         # For relative mouse movement
         self.last_mouse_x = None
@@ -160,63 +203,29 @@ class InputCapture:
 
         # Cursor hiding state
         self.cursor_hidden = False
-        self._last_focus_check = 0
-        self._last_focus_state = False
+        self._last_focus_state = False  # Written by the focus thread, read per event
+        self._focus_window_id = None     # Last focused window that matched UxPlay
         self._cursor_display = None
-        self._raw_display = None
-        self._blank_cursor_id = None
+        self._blank_cursor = None
         self._uxplay_window = None
+        self._uxplay_search_after_ns = 0  # monotonic_ns before which we don't re-search
 
     def _init_cursor_hiding(self):
         """Initialize cursor hiding with a blank cursor."""
-        if not _xlib:
-            return
-
         try:
             self._cursor_display = display.Display()
-            screen = self._cursor_display.screen()
-
-            # Get the raw X display pointer and root window
-            xdisplay = self._cursor_display.display.display_name
-            # Open a raw X connection for ctypes
-            self._raw_display = _xlib.XOpenDisplay(xdisplay.encode() if xdisplay else None)
-            if not self._raw_display:
-                return
-
-            # Create blank 1x1 pixmaps for source and mask
-            root_id = screen.root.id
-            source = _xlib.XCreatePixmap(self._raw_display, root_id, 1, 1, 1)
-            mask = _xlib.XCreatePixmap(self._raw_display, root_id, 1, 1, 1)
-
-            # XColor structure for black (all zeros works)
-            class XColor(ctypes.Structure):
-                _fields_ = [
-                    ('pixel', ctypes.c_ulong),
-                    ('red', ctypes.c_ushort),
-                    ('green', ctypes.c_ushort),
-                    ('blue', ctypes.c_ushort),
-                    ('flags', ctypes.c_char),
-                    ('pad', ctypes.c_char),
-                ]
-
-            black = XColor(0, 0, 0, 0, b'\x00', b'\x00')
-
-            # Create the blank cursor
-            cursor_id = _xlib.XCreatePixmapCursor(
-                self._raw_display,
-                source, mask,
-                ctypes.byref(black), ctypes.byref(black),
-                0, 0
-            )
-
-            _xlib.XFreePixmap(self._raw_display, source)
-            _xlib.XFreePixmap(self._raw_display, mask)
+            root = self._cursor_display.screen().root
 
-            if cursor_id:
-                self._blank_cursor_id = cursor_id
+            # Cleared 1x1 bitmap as both source and mask: a fully transparent cursor
+            pixmap = root.create_pixmap(1, 1, 1)
+            gc = pixmap.create_gc(foreground=0)
+            pixmap.fill_rectangle(gc, 0, 0, 1, 1)
+            gc.free()
+            self._blank_cursor = pixmap.create_cursor(pixmap, (0, 0, 0), (0, 0, 0), 0, 0)
+            pixmap.free()
         except Exception:
             self._cursor_display = None
-            self._blank_cursor_id = None
+            self._blank_cursor = None
 
     def _cleanup_cursor_hiding(self):
         """Clean up cursor resources."""
@@ -228,27 +237,15 @@ class InputCapture:
             except Exception:
                 pass
 
-        if self._blank_cursor_id and self._raw_display and _xlib:
-            try:
-                _xlib.XFreeCursor(self._raw_display, self._blank_cursor_id)
-            except Exception:
-                pass
-            self._blank_cursor_id = None
-
-        if self._raw_display and _xlib:
-            try:
-                _xlib.XCloseDisplay(self._raw_display)
-            except Exception:
-                pass
-            self._raw_display = None
-
         if self._cursor_display:
             try:
+                # Closing the connection also frees the blank cursor
                 self._cursor_display.close()
             except Exception:
                 pass
             self._cursor_display = None
 
+        self._blank_cursor = None
         self._uxplay_window = None
         self.cursor_hidden = False
 
@@ -263,40 +260,39 @@ class InputCapture:
         except Exception:
             return None
 
-    def _search_window_tree(self, window):
-        """Recursively search window tree for UxPlay window."""
+    def _matches_uxplay(self, window) -> bool:
+        """Check whether a window's WM_NAME or WM_CLASS looks like UxPlay."""
+        search = self._UXPLAY_RE.search
         try:
-            # Check this window
-            try:
-                wm_name = window.get_wm_name()
-                if wm_name:
-                    wm_name_lower = wm_name.lower()
-                    for pattern in self.UXPLAY_WINDOW_PATTERNS:
-                        if pattern in wm_name_lower:
-                            return window
-            except Exception:
-                pass
+            wm_name = window.get_wm_name()
+            if wm_name and search(wm_name):
+                return True
+        except Exception:
+            pass
+
+        try:
+            wm_class = window.get_wm_class()
+            if wm_class:
+                for cls in wm_class:
+                    if cls and search(cls):
+                        return True
+        except Exception:
+            pass
+        return False
 
+    def _search_window_tree(self, window):
+        """Breadth-first search of the window tree for the UxPlay window."""
+        # Top-level windows come first, which is where UxPlay's window lives
+        queue = deque((window,))
+        while queue:
+            window = queue.popleft()
+            if self._matches_uxplay(window):
+                return window
             try:
-                wm_class = window.get_wm_class()
-                if wm_class:
-                    for cls in wm_class:
-                        if cls:
-                            cls_lower = cls.lower()
-                            for pattern in self.UXPLAY_WINDOW_PATTERNS:
-                                if pattern in cls_lower:
-                                    return window
+                # Children come bottom-to-top; a new window is near the top
+                queue.extend(reversed(window.query_tree().children))
             except Exception:
                 pass
-
-            # Search children
-            children = window.query_tree().children
-            for child in children:
-                result = self._search_window_tree(child)
-                if result:
-                    return result
-        except Exception:
-            pass
         return None
 
     def _is_cursor_in_content_area(self) -> bool:
@@ -343,12 +339,6 @@ class InputCapture:
 
     def _update_cursor_visibility(self):
         """Update cursor visibility based on focus."""
-        now = time.time()
-        # Only check every 100ms
-        if now - self._last_focus_check < 0.1:
-            return
-        self._last_focus_check = now
-
         focused = self._is_uxplay_focused()
 
         if focused != self._last_focus_state:
@@ -357,33 +347,46 @@ class InputCapture:
                 self._hide_cursor()
             else:
                 self._show_cursor()
+        elif focused and not self.cursor_hidden:
+            # Window wasn't found when focus arrived; retry (rate-limited)
+            self._hide_cursor()
 
     def _hide_cursor(self):
         """Hide cursor by setting blank cursor on UxPlay window."""
-        if self.cursor_hidden or not self._blank_cursor_id or not self._raw_display:
+        if self.cursor_hidden or not self._blank_cursor:
             return
 
         try:
-            # Find UxPlay window if we haven't yet
+            # Reuse the cached window if it still exists, otherwise search
+            if self._uxplay_window:
+                try:
+                    self._uxplay_window.get_attributes()
+                except Exception:
+                    self._uxplay_window = None
             if not self._uxplay_window:
+                now_ns = time.monotonic_ns()
+                if now_ns < self._uxplay_search_after_ns:
+                    return
                 self._uxplay_window = self._find_uxplay_window()
+                if not self._uxplay_window:
+                    self._uxplay_search_after_ns = now_ns + WINDOW_SEARCH_COOLDOWN_NS
 
-            if self._uxplay_window and _xlib:
-                _xlib.XDefineCursor(self._raw_display, self._uxplay_window.id, self._blank_cursor_id)
-                _xlib.XFlush(self._raw_display)
+            if self._uxplay_window:
+                self._uxplay_window.change_attributes(cursor=self._blank_cursor)
+                self._cursor_display.flush()
                 self.cursor_hidden = True
         except Exception:
             self._uxplay_window = None
 
     def _show_cursor(self):
         """Show cursor by resetting cursor on UxPlay window."""
-        if not self.cursor_hidden or not self._raw_display:
+        if not self.cursor_hidden or not self._cursor_display:
             return
 
         try:
-            if self._uxplay_window and _xlib:
-                _xlib.XUndefineCursor(self._raw_display, self._uxplay_window.id)
-                _xlib.XFlush(self._raw_display)
+            if self._uxplay_window:
+                self._uxplay_window.change_attributes(cursor=X.NONE)
+                self._cursor_display.flush()
         except Exception:
             self._uxplay_window = None
 
@@ -404,79 +407,110 @@ class InputCapture:
 
             if not window or window == X.NONE:
                 return False
+            self._watch_focus_window(window)
 
-            # Try to get window name
-            try:
-                wm_name = window.get_wm_name()
-                if wm_name:
-                    wm_name_lower = wm_name.lower()
-                    for pattern in self.UXPLAY_WINDOW_PATTERNS:
-                        if pattern in wm_name_lower:
-                            return True
-            except Exception:
-                pass
-
-            # Try to get WM_CLASS
-            try:
-                wm_class = window.get_wm_class()
-                if wm_class:
-                    for cls in wm_class:
-                        if cls:
-                            cls_lower = cls.lower()
-                            for pattern in self.UXPLAY_WINDOW_PATTERNS:
-                                if pattern in cls_lower:
-                                    return True
-            except Exception:
-                pass
-
+            # Same window already matched: skip the WM_NAME/WM_CLASS round trips.
+            # Misses aren't cached, a new window may not have set its name yet.
+            window_id = getattr(window, 'id', window)
+            if window_id == self._focus_window_id:
+                return True
+            if self._matches_uxplay(window):
+                self._focus_window_id = window_id
+                return True
             return False
         except Exception:
             # On error, allow capture (fail open)
             return True
 
-    def _keysym_to_hid(self, keysym: int) -> Optional[int]:
-        """Convert X11 keysym to HID usage code."""
-        # Check direct keysym mapping first (for special keys)
-        if keysym in KEYSYM_TO_HID:
-            return KEYSYM_TO_HID[keysym]
+    def _init_focus_events(self):
+        """Select the root property changes that signal a new active window."""
+        root = self.focus_display.screen().root
+        root.change_attributes(event_mask=X.PropertyChangeMask)
+        self._focus_atoms = frozenset((
+            self.focus_display.intern_atom('_NET_ACTIVE_WINDOW'),
+            self.focus_display.intern_atom('_NET_WM_NAME'),
+            Xatom.WM_NAME,
+            Xatom.WM_CLASS,
+        ))
+
+    def _watch_focus_window(self, window):
+        """Move the FOCUS_WINDOW_EVENTS selection to the newly focused window."""
+        if not hasattr(window, 'change_attributes'):
+            return  # PointerRoot
+        watched = self._watched_window
+        if watched is not None and watched.id == window.id:
+            return
+        if window.id == self.focus_display.screen().root.id:
+            return  # Root keeps its own PropertyChangeMask selection
+        # Either window may already be gone; ignore BadWindow for both
+        onerror = error.CatchError(error.BadWindow)
+        if watched is not None:
+            watched.change_attributes(event_mask=X.NoEventMask, onerror=onerror)
+        window.change_attributes(event_mask=FOCUS_WINDOW_EVENTS, onerror=onerror)
+        self._watched_window = window
+
+    def _wait_for_focus_change(self, timeout):
+        """Block until focus or the keymap may have changed, or stop() is called."""
+        dpy = self.focus_display
+        fds = [dpy, self.local_display, self._focus_wake[0]]
+        while True:
+            if not dpy.pending_events():
+                dpy.flush()
+                readable, _, _ = select.select(fds, [], [], timeout)
+                if dpy not in readable:
+                    return  # Timed out, woken by stop(), or keymap events
+            changed = False
+            # Drain everything queued; one focus check covers the whole batch
+            while dpy.pending_events():
+                evt = dpy.next_event()
+                if evt.type in (X.FocusIn, X.FocusOut):
+                    changed = True
+                elif evt.type == X.PropertyNotify and evt.atom in self._focus_atoms:
+                    changed = True
+            if changed:
+                return
 
-        # Fall back to string-based lookup
+    def _build_keycode_tables(self):
+        """Resolve every keycode's unshifted keysym to HID codes once."""
+        keycode_hid = bytearray(256)
+        keycode_modifier = bytearray(256)
+        exit_keycodes = set()
+        info = self.local_display.display.info
+        for keycode in range(info.min_keycode, info.max_keycode + 1):
+            keysym = self.local_display.keycode_to_keysym(keycode, 0)
+            if not keysym:
+                continue
+            modifier = MODIFIER_KEYSYMS.get(keysym)
+            if modifier is not None:
+                keycode_modifier[keycode] = modifier
+            else:
+                keycode_hid[keycode] = KEYSYM_HID_MAP.get(keysym, 0)
+            if keysym in EXIT_KEYSYMS:
+                exit_keycodes.add(keycode)
+        self._keycode_hid = bytes(keycode_hid)
+        self._keycode_modifier = bytes(keycode_modifier)
+        self._exit_keycodes = frozenset(exit_keycodes)
+
+    def _check_keymap_changes(self):
+        """Rebuild the keycode tables if the keyboard mapping changed."""
         try:
-            key_name = XK.keysym_to_string(keysym)
-            if key_name:
-                key_name = key_name.lower()
-                return KEY_CODES.get(key_name)
+            changed = False
+            while self.local_display.pending_events():
+                evt = self.local_display.next_event()
+                if evt.type == X.MappingNotify and evt.request == X.MappingKeyboard:
+                    self.local_display.refresh_keyboard_mapping(evt)
+                    changed = True
+            if changed:
+                self._build_keycode_tables()
         except Exception:
             pass
-        return None
-
-    def _is_modifier(self, keysym: int) -> bool:
-        """Check if keysym is a modifier key."""
-        return keysym in MODIFIER_KEYSYMS
-
-    def _update_modifier(self, keysym: int, pressed: bool):
-        """Update modifier state for a keysym."""
-        if keysym in MODIFIER_KEYSYMS:
-            if pressed:
-                self.modifier_state |= MODIFIER_KEYSYMS[keysym]
-            else:
-                self.modifier_state &= ~MODIFIER_KEYSYMS[keysym]
-
-    def _check_exit_hotkey(self, keysym: int) -> bool:
-        """Check if exit hotkey (Ctrl+Alt+Q) was pressed."""
-        if keysym == XK.XK_q or keysym == XK.XK_Q:
-            if (self.modifier_state & (MODIFIER_LEFT_CTRL | MODIFIER_LEFT_ALT) ==
-                    (MODIFIER_LEFT_CTRL | MODIFIER_LEFT_ALT)):
-                return True
-        return False
 
     def _send_keyboard_state(self):
         """Send current keyboard state via callback."""
-        if not self._is_uxplay_focused():
+        if not self._last_focus_state:
             return
-        # HID supports up to 6 simultaneous keys
-        keys = list(self.pressed_keys)[:6]
-        self.keyboard_callback(self.modifier_state, keys)
+        # Snapshot: the callback may queue the keys for another thread
+        self.keyboard_callback(self.modifier_state, bytes(self.pressed_keys))
 
     def _process_event(self, reply):
         """Process X11 record event."""
@@ -485,80 +519,87 @@ class InputCapture:
         if reply.client_swapped:
             return
 
-        # Update cursor visibility based on focus
-        self._update_cursor_visibility()
+        # Motion within one reply is summed and sent as a single report
+        motion_dx = motion_dy = 0
 
-        data = reply.data
+        # memoryview so consuming each 32-byte event doesn't copy the remainder
+        data = memoryview(reply.data)
+        parse = _EVENT_FIELD.parse_binary_value
+        xdisplay = self.record_display.display
         while len(data):
-            event, data = rq.EventField(None).parse_binary_value(
-                data, self.record_display.display, None, None
-            )
+            event, data = parse(data, xdisplay, None, None)
+
+            if event.type != X.MotionNotify and (motion_dx or motion_dy):
+                # Flush pending motion first so clicks land where expected
+                if self._last_focus_state:
+                    self.mouse_callback(self.mouse_buttons, motion_dx, motion_dy, 0)
+                motion_dx = motion_dy = 0
 
             if event.type == X.KeyPress:
-                keysym = self.local_display.keycode_to_keysym(event.detail, 0)
+                keycode = event.detail
 
                 # Check exit hotkey
-                if self._check_exit_hotkey(keysym):
+                if (keycode in self._exit_keycodes and
+                        self.modifier_state & EXIT_MODIFIERS == EXIT_MODIFIERS):
                     print("\nExit hotkey pressed (Ctrl+Alt+Q)")
                     self.stop()
                     return
 
                 # Handle modifiers
-                if self._is_modifier(keysym):
-                    self._update_modifier(keysym, True)
+                modifier = self._keycode_modifier[keycode]
+                if modifier:
+                    self.modifier_state |= modifier
                     self._send_keyboard_state()
                 else:
                     # Regular key
-                    hid_code = self._keysym_to_hid(keysym)
-                    if hid_code:
-                        self.pressed_keys.add(hid_code)
-                        self._send_keyboard_state()
+                    hid_code = self._keycode_hid[keycode]
+                    if hid_code and hid_code not in self.pressed_keys:
+                        # HID supports up to 6 simultaneous keys; extras are dropped
+                        slot = self.pressed_keys.find(0)
+                        if slot >= 0:
+                            self.pressed_keys[slot] = hid_code
+                            self._send_keyboard_state()
 
             elif event.type == X.KeyRelease:
-                keysym = self.local_display.keycode_to_keysym(event.detail, 0)
+                keycode = event.detail
 
                 # Handle modifiers
-                if self._is_modifier(keysym):
-                    self._update_modifier(keysym, False)
+                modifier = self._keycode_modifier[keycode]
+                if modifier:
+                    self.modifier_state &= ~modifier
                     self._send_keyboard_state()
                 else:
                     # Regular key
-                    hid_code = self._keysym_to_hid(keysym)
-                    if hid_code:
-                        self.pressed_keys.discard(hid_code)
+                    hid_code = self._keycode_hid[keycode]
+                    slot = self.pressed_keys.find(hid_code) if hid_code else -1
+                    if slot >= 0:
+                        # Close the gap so held keys stay packed at the front
+                        del self.pressed_keys[slot]
+                        self.pressed_keys.append(0)
                         self._send_keyboard_state()
 
             elif event.type == X.ButtonPress:
                 button = event.detail
-                if button == 1:  # Left
-                    self.mouse_buttons |= 0x01
-                elif button == 2:  # Middle
-                    self.mouse_buttons |= 0x04
-                elif button == 3:  # Right
-                    self.mouse_buttons |= 0x02
-                elif button == 4:  # Scroll up (natural scrolling: content moves down)
-                    if self._is_uxplay_focused():
-                        self.mouse_callback(self.mouse_buttons, 0, 0, -3)
-                    continue
-                elif button == 5:  # Scroll down (natural scrolling: content moves up)
-                    if self._is_uxplay_focused():
-                        self.mouse_callback(self.mouse_buttons, 0, 0, 3)
-                    continue
-                if self._is_uxplay_focused():
+                if button < 8:
+                    wheel = _BUTTON_WHEEL[button]
+                    if wheel:
+                        # Scroll wheel: one report, nothing to release
+                        if self._last_focus_state:
+                            self.mouse_callback(self.mouse_buttons, 0, 0, wheel)
+                        continue
+                    self.mouse_buttons |= _BUTTON_MASK[button]
+                if self._last_focus_state:
                     self.mouse_callback(self.mouse_buttons, 0, 0, 0)
 
             elif event.type == X.ButtonRelease:
                 button = event.detail
-                if button == 1:  # Left
-                    self.mouse_buttons &= ~0x01
-                elif button == 2:  # Middle
-                    self.mouse_buttons &= ~0x04
-                elif button == 3:  # Right
-                    self.mouse_buttons &= ~0x02
-                # Ignore scroll button releases
-                if button not in (4, 5):
-                    if self._is_uxplay_focused():
-                        self.mouse_callback(self.mouse_buttons, 0, 0, 0)
+                if button < 8:
+                    if _BUTTON_WHEEL[button]:
+                        # Ignore scroll button releases
+                        continue
+                    self.mouse_buttons &= ~_BUTTON_MASK[button]
+                if self._last_focus_state:
+                    self.mouse_callback(self.mouse_buttons, 0, 0, 0)
 
             elif event.type == X.MotionNotify:
                 x, y = event.root_x, event.root_y
@@ -569,18 +610,32 @@ class InputCapture:
                     if not (rx <= x < rx + rw and ry <= y < ry + rh):
                         continue
 
-                # Calculate relative movement
+                # Accumulate relative movement
                 if self.last_mouse_x is not None:
-                    dx = x - self.last_mouse_x
-                    dy = y - self.last_mouse_y
-
-                    if dx != 0 or dy != 0:
-                        if self._is_uxplay_focused():
-                            self.mouse_callback(self.mouse_buttons, dx, dy, 0)
+                    motion_dx += x - self.last_mouse_x
+                    motion_dy += y - self.last_mouse_y
 
                 self.last_mouse_x = x
                 self.last_mouse_y = y
 
+        if (motion_dx or motion_dy) and self._last_focus_state:
+            self.mouse_callback(self.mouse_buttons, motion_dx, motion_dy, 0)
+
+    def _focus_loop(self):
+        """Track focus and cursor visibility off the input path."""
+        while not self._focus_stop.is_set():
+            self._update_cursor_visibility()
+            self._check_keymap_changes()
+            # Only wake on a timer while a cursor hide is waiting out the search cooldown
+            timeout = None
+            if self._last_focus_state and not self.cursor_hidden and self._blank_cursor:
+                timeout = WINDOW_SEARCH_COOLDOWN_NS / 1e9
+            try:
+                self._wait_for_focus_change(timeout)
+            except Exception:
+                # Focus connection broke; fall back to polling at the cooldown rate
+                self._focus_stop.wait(WINDOW_SEARCH_COOLDOWN_NS / 1e9)
+
     def _capture_loop(self):
         """Main capture loop running in separate thread."""
         try:
@@ -599,6 +654,9 @@ class InputCapture:
             self.local_display = display.Display()
             self.record_display = display.Display()
             self.focus_display = display.Display()  # For focus checks
+            self._build_keycode_tables()
+            if self.require_focus:
+                self._init_focus_events()
 
             # Initialize cursor hiding (separate connection)
             self._init_cursor_hiding()
@@ -626,6 +684,12 @@ class InputCapture:
 
             self.capturing = True
 
+            # Focus thread owns the focus and cursor connections from here on
+            self._focus_stop.clear()
+            self._focus_wake = os.pipe()
+            self.focus_thread = threading.Thread(target=self._focus_loop, daemon=True)
+            self.focus_thread.start()
+
             # Start capture thread
             self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
             self.capture_thread.start()
@@ -643,6 +707,16 @@ class InputCapture:
 
             self.capturing = False
 
+            # Stop the focus thread before closing the connections it uses
+            self._focus_stop.set()
+            os.write(self._focus_wake[1], b'x')
+            if self.focus_thread and self.focus_thread is not threading.current_thread():
+                self.focus_thread.join()
+            self.focus_thread = None
+            for fd in self._focus_wake:
+                os.close(fd)
+            self._focus_wake = None
+
             # Restore cursor and cleanup cursor connection
             self._cleanup_cursor_hiding()
 
@@ -673,12 +747,14 @@ class InputCapture:
 
             # Reset state
             self.modifier_state = 0
-            self.pressed_keys.clear()
+            self.pressed_keys[:] = bytes(6)
             self.mouse_buttons = 0
             self.last_mouse_x = None
             self.last_mouse_y = None
             self.cursor_hidden = False
             self._last_focus_state = False
+            self._focus_window_id = None
+            self._watched_window = None
 
             print("Input capture stopped")
 
@@ -691,7 +767,7 @@ class InputCapture:
 def main():
     """Test input capture."""
     def on_keyboard(modifiers, keys):
-        print(f"Keyboard: modifiers={modifiers:02x}, keys={keys}")
+        print(f"Keyboard: modifiers={modifiers:02x}, keys={keys.hex()}")
 
     def on_mouse(buttons, x, y, wheel):
         if x != 0 or y != 0 or wheel != 0 or buttons != 0:
@@ -20,39 +20,67 @@ import sys
 import signal
 import asyncio
 import argparse
+import logging
 import os
+from collections import deque
 from ble_hid_profile import BLEHIDProfile
 from input_capture import InputCapture
 
 # Stop file - launcher creates this to signal shutdown
 STOP_FILE = "/tmp/ipad-remote-stop"
+# How often to look for the stop file (the launcher waits 1 s before removing it)
+STOP_FILE_POLL_INTERVAL = 0.5
 
 
 class IPadRemote:
     """Main application class for iPad Remote."""
 
-    def __init__(self, device_name: str = "iPad Remote"):
+    def __init__(self, device_name: str = "iPad Remote", adapter_path: str = None):
         self.device_name = device_name
+        self.adapter_path = adapter_path
         self.hid_profile: BLEHIDProfile = None
         self.input_capture: InputCapture = None
         self.running = False
         self.loop: asyncio.AbstractEventLoop = None
+        self._stop_event: asyncio.Event = None
 
-    def on_keyboard_event(self, modifier_keys: int, keys: list):
+        # Input events from the capture thread, drained in batches on the loop.
+        # Unbounded on purpose: dropping a key release would leave a key stuck.
+        self._events = deque()
+        self._drain_scheduled = False
+
+    def on_keyboard_event(self, modifier_keys: int, keys: bytes):
         """Handle keyboard events from input capture."""
         if self.hid_profile and self.loop:
-            asyncio.run_coroutine_threadsafe(
-                self.hid_profile.send_keyboard_report(modifier_keys, keys),
-                self.loop
-            )
+            self._events.append((False, modifier_keys, keys))
+            self._wake_drain()
 
     def on_mouse_event(self, buttons: int, x: int, y: int, wheel: int):
         """Handle mouse events from input capture."""
         if self.hid_profile and self.loop:
-            asyncio.run_coroutine_threadsafe(
-                self.hid_profile.send_mouse_report(buttons, x, y, wheel),
-                self.loop
-            )
+            self._events.append((True, buttons, x, y, wheel))
+            self._wake_drain()
+
+    def _wake_drain(self):
+        """Schedule one drain for everything queued so far (capture thread)."""
+        if not self._drain_scheduled:
+            self._drain_scheduled = True
+            self.loop.call_soon_threadsafe(self._start_drain)
+
+    def _start_drain(self):
+        self.loop.create_task(self._drain_events())
+
+    async def _drain_events(self):
+        """Send all queued input events in order."""
+        # Clear first: anything queued after this schedules another drain
+        self._drain_scheduled = False
+        events = self._events
+        while events:
+            event = events.popleft()
+            if event[0]:
+                await self.hid_profile.send_mouse_report(*event[1:])
+            else:
+                await self.hid_profile.send_keyboard_report(*event[1:])
 
     async def run(self):
         """Run the iPad Remote service."""
@@ -66,10 +94,13 @@ class IPadRemote:
         print()
 
         self.loop = asyncio.get_event_loop()
+        self._stop_event = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, self._on_signal, sig)
 
         # Initialize BLE HID profile
         print("Initializing BLE HID profile...")
-        self.hid_profile = BLEHIDProfile(self.device_name)
+        self.hid_profile = BLEHIDProfile(self.device_name, self.adapter_path)
 
         try:
             # Start BLE server
@@ -101,12 +132,16 @@ class IPadRemote:
             self.running = True
             self.input_capture.start()
 
-            # Keep running until interrupted or stop file appears
-            while self.running:
+            # Keep running until interrupted or stop file appears; signals
+            # wake the wait at once, the stop file is checked on timeout
+            while not self._stop_event.is_set():
                 if os.path.exists(STOP_FILE):
                     print("\nStop signal received from launcher")
                     break
-                await asyncio.sleep(0.1)
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), STOP_FILE_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
 
         except Exception as e:
             print(f"ERROR: {e}")
@@ -115,12 +150,19 @@ class IPadRemote:
         finally:
             await self.stop()
 
+    def _on_signal(self, signum):
+        """Handle SIGINT/SIGTERM on the event loop."""
+        print(f"\nReceived signal {signum}")
+        # Leave running alone so stop() still does the cleanup
+        self._stop_event.set()
+
     async def stop(self):
         """Stop the iPad Remote service."""
         if not self.running:
             return
 
         self.running = False
+        self._stop_event.set()
         print("\nShutting down iPad Remote...")
 
         if self.input_capture:
@@ -133,13 +175,6 @@ class IPadRemote:
 
     def start(self):
         """Start the application (blocking)."""
-        def signal_handler(signum, frame):
-            print(f"\nReceived signal {signum}")
-            self.running = False
-
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
-
         asyncio.run(self.run())
 
 
@@ -152,9 +187,23 @@ def main():
         default="iPad Remote",
         help="Bluetooth device name (default: iPad Remote)"
     )
+    parser.add_argument(
+        "--adapter",
+        help="BlueZ adapter object path, e.g. /org/bluez/hci1 (default: $BLE_ADAPTER or hci0)"
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Log BLE pairing and notification events"
+    )
     args = parser.parse_args()
 
-    app = IPadRemote(device_name=args.name)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format="%(name)s: %(message)s"
+    )
+
+    app = IPadRemote(device_name=args.name, adapter_path=args.adapter)
     app.start()
 
 
@@ -4,54 +4,109 @@ Monitor for UxPlay window and exit when it disappears.
 Used by the launcher to detect when user closes the UxPlay window.
 """
 
+from collections import deque
+import os
+import re
+import select
 import sys
-import time
 from Xlib import display, X
 
 # Patterns to match UxPlay's video window (created by GStreamer)
 # The window could have various names depending on GStreamer sink used
-UXPLAY_PATTERNS = [
+UXPLAY_PATTERNS = (
     'uxplay',           # UxPlay window class
     'gst',              # GStreamer windows (gst-launch, etc)
     'autovideosink',    # GStreamer auto sink
     'xvimagesink',      # X video image sink
     'ximagesink',       # X image sink
     'glimagesink',      # OpenGL sink
-]
-CHECK_INTERVAL = 0.5  # seconds
+)
+UXPLAY_RE = re.compile('|'.join(map(re.escape, UXPLAY_PATTERNS)), re.IGNORECASE)
+# Re-check anyway if no structural event arrives for this long (seconds)
+FALLBACK_INTERVAL = 5.0
 
+# Environment variable naming the launcher's FIFO to the waiting dialog
+READY_FIFO_ENV = 'UXPLAY_READY_FIFO'
 
-def find_uxplay_window(dpy, window):
-    """Recursively search for UxPlay window."""
+# Root SubstructureNotify events that can mean a window appeared or went away
+# (ConfigureNotify etc. are ignored so dragging a window doesn't trigger walks)
+TREE_EVENTS = frozenset((X.CreateNotify, X.DestroyNotify, X.MapNotify,
+                         X.UnmapNotify, X.ReparentNotify))
+
+
+def matches_uxplay(window):
+    """Check whether a window's name or class looks like UxPlay."""
     try:
         wm_name = window.get_wm_name()
-        if wm_name:
-            wm_name_lower = wm_name.lower()
-            for pattern in UXPLAY_PATTERNS:
-                if pattern in wm_name_lower:
-                    return True
+        if wm_name and UXPLAY_RE.search(wm_name):
+            return True
 
         wm_class = window.get_wm_class()
         if wm_class:
             for cls in wm_class:
-                if cls:
-                    cls_lower = cls.lower()
-                    for pattern in UXPLAY_PATTERNS:
-                        if pattern in cls_lower:
-                            return True
+                if cls and UXPLAY_RE.search(cls):
+                    return True
     except Exception:
         pass
+    return False
+
+
+def find_uxplay_window(dpy, root, cached_id=None):
+    """Return the id of a UxPlay window, or None if there isn't one.
+
+    If cached_id (a previous result) still exists it is returned without
+    walking the tree.
+    """
+    if cached_id:
+        try:
+            dpy.create_resource_object('window', cached_id).get_attributes()
+            return cached_id
+        except Exception:
+            pass
 
+    stack = deque([root])
+    while stack:
+        window = stack.pop()
+        if matches_uxplay(window):
+            return window.id
+        try:
+            stack.extend(window.query_tree().children)
+        except Exception:
+            pass
+
+    return None
+
+
+def wait_for_tree_change(dpy):
+    """Block until top-level windows change, or FALLBACK_INTERVAL passes."""
+    while True:
+        if not dpy.pending_events():
+            readable, _, _ = select.select([dpy], [], [], FALLBACK_INTERVAL)
+            if not readable:
+                return
+        changed = False
+        # Drain everything queued; one tree walk covers the whole batch
+        while dpy.pending_events():
+            if dpy.next_event().type in TREE_EVENTS:
+                changed = True
+        if changed:
+            return
+
+
+def notify_ready():
+    """Tell the waiting dialog, if the launcher set one up, that UxPlay is up."""
+    path = os.environ.get(READY_FIFO_ENV)
+    if not path:
+        return
     try:
-        children = window.query_tree().children
-        for child in children:
-            if find_uxplay_window(dpy, child):
-                return True
-    except Exception:
+        fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        try:
+            os.write(fd, b'\n')
+        finally:
+            os.close(fd)
+    except OSError:
         pass
 
-    return False
-
 
 def main():
     """Wait for UxPlay window to appear, then exit when it disappears."""
@@ -62,19 +117,23 @@ def main():
         sys.exit(1)
 
     root = dpy.screen().root
+    root.change_attributes(event_mask=X.SubstructureNotifyMask)
     window_appeared = False
+    window_id = None
 
     while True:
-        window_exists = find_uxplay_window(dpy, root)
+        window_id = find_uxplay_window(dpy, root, window_id)
+        window_exists = window_id is not None
 
         if window_exists and not window_appeared:
             window_appeared = True
+            notify_ready()
 
         elif not window_exists and window_appeared:
             # Window was there but now gone - user closed it
             sys.exit(0)
 
-        time.sleep(CHECK_INTERVAL)
+        wait_for_tree_change(dpy)
 
 
 if __name__ == "__main__":
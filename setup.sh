@@ -23,7 +23,6 @@ echo "Installing system packages..."
 apt update
 apt install -y \
     uxplay \
-    python3-dbus \
     python3-gi \
     python3-venv \
     bluez \
@@ -35,7 +34,7 @@ apt install -y \
 echo ""
 echo "Setting up Python virtual environment..."
 
-# Create venv with system site packages (for dbus and gi)
+# Create venv with system site packages (for gi)
 if [ ! -d "$SCRIPT_DIR/venv" ]; then
     python3 -m venv --system-site-packages "$SCRIPT_DIR/venv"
 fi
@@ -43,7 +42,7 @@ fi
 # Install pip packages
 source "$SCRIPT_DIR/venv/bin/activate"
 pip install --upgrade pip
-pip install python-xlib
+pip install python-xlib dbus-fast
 
 echo ""
 echo "Configuring Bluetooth..."
@@ -3,25 +3,52 @@
 Waiting dialog that shows until iPad connects and UxPlay window appears.
 """
 
+from collections import deque
+import os
+import re
+
 import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, GLib
 
-from Xlib import display
+# Only the constant modules here; Xlib.display is imported once the dialog
+# has drawn (see _setup_x), as it pulls in most of python-xlib
+from Xlib import X, Xatom
+
+# Environment variable naming the launcher's FIFO; monitor_uxplay_window.py
+# writes to it once UxPlay's window is up
+READY_FIFO_ENV = 'UXPLAY_READY_FIFO'
+
+# Root window events after which the window list may have changed
+WINDOW_EVENTS = frozenset((X.CreateNotify, X.MapNotify, X.ReparentNotify))
+# Re-check anyway, in case a name is set after its window maps: soon after a
+# window event, then backing off (doubling) to the slowest interval (ms)
+WATCHDOG_MIN_INTERVAL_MS = 500
+WATCHDOG_INTERVAL_MS = 5000
+
+# Levels below the root searched without EWMH (root -> WM frame(s) -> client)
+MAX_SEARCH_DEPTH = 3
+
+# How much of WM_NAME/WM_CLASS to read per window, in 32-bit units
+WM_PROPERTY_LENGTH = 256
 
 
 class WaitingDialog(Gtk.Window):
     """Simple dialog showing connection instructions."""
 
     # Patterns to match UxPlay's video window (created by GStreamer)
-    UXPLAY_PATTERNS = [
+    UXPLAY_PATTERNS = (
         'uxplay',           # UxPlay window class
         'gst',              # GStreamer windows
         'autovideosink',    # GStreamer auto sink
         'xvimagesink',      # X video image sink
         'ximagesink',       # X image sink
         'glimagesink',      # OpenGL sink
-    ]
+    )
+    # All patterns as one case-insensitive regex, so a name is scanned once.
+    # Bytes, to match raw property values without decoding them
+    _UXPLAY_RE = re.compile(b'|'.join(re.escape(p.encode()) for p in UXPLAY_PATTERNS),
+                            re.IGNORECASE)
 
     def __init__(self):
         super().__init__(title="iPad Remote")
@@ -63,22 +90,117 @@ class WaitingDialog(Gtk.Window):
 
         # Start checking for UxPlay window
         self.display = None
+        self._root = None
+        self._net_client_list = None
+        self._net_wm_name = None
+        self._sources = []
+        self._watchdog_id = None
+        self._watchdog_interval = WATCHDOG_MIN_INTERVAL_MS
+        # Client window id -> (wm_name, wm_class); the watchdog clears it so
+        # names that change after a window appears are still picked up
+        self._wm_cache = {}
+
+        # The launcher's window monitor already watches for UxPlay; just
+        # wait for it instead of scanning X windows here too
+        ready_fifo = os.environ.get(READY_FIFO_ENV)
+        if ready_fifo and self._watch_ready_fifo(ready_fifo):
+            return
+
+        # Connect to X after the first frame (idle runs below redraw priority)
+        GLib.idle_add(self._setup_x)
+
+    def _watch_ready_fifo(self, path):
+        """Close the dialog when something is written to the FIFO at path."""
+        try:
+            fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        except OSError:
+            return False
+        GLib.io_add_watch(fd, GLib.PRIORITY_DEFAULT, GLib.IO_IN, self._on_ready)
+        return True
+
+    def _on_ready(self, fd, condition):
+        """UxPlay window is up, close this dialog."""
+        self.destroy()
+        return False
+
+    def _setup_x(self):
+        """Open the X connection and start watching for UxPlay."""
+        from Xlib import display
+
         try:
             self.display = display.Display()
+            self._root = self.display.screen().root
+            # EWMH: the window manager keeps the list of managed top-level windows
+            self._net_client_list = self.display.intern_atom('_NET_CLIENT_LIST')
+            self._net_wm_name = self.display.intern_atom('_NET_WM_NAME')
+
+            # Wake up only when top-level windows or the client list change
+            self._root.change_attributes(
+                event_mask=X.SubstructureNotifyMask | X.PropertyChangeMask)
+            self.display.flush()
+            self._sources.append(GLib.io_add_watch(
+                self.display.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN,
+                self._on_x_event))
+        except Exception:
+            pass
+
+        self._schedule_watchdog(WATCHDOG_MIN_INTERVAL_MS)
+        # UxPlay may have been up before the dialog
+        self._check_for_uxplay()
+        return False
+
+    def _schedule_watchdog(self, interval):
+        """(Re)start the fallback timer with the given interval in ms."""
+        if self._watchdog_id is not None:
+            GLib.source_remove(self._watchdog_id)
+        self._watchdog_interval = interval
+        self._watchdog_id = GLib.timeout_add(interval, self._on_watchdog)
+
+    def _on_watchdog(self):
+        """Fallback check; each quiet tick doubles the interval up to the cap."""
+        self._watchdog_id = None
+        self._wm_cache.clear()
+        if self._check_for_uxplay():
+            self._schedule_watchdog(
+                min(self._watchdog_interval * 2, WATCHDOG_INTERVAL_MS))
+        return False  # Replaced by the rescheduled timer
+
+    def _on_x_event(self, source, condition):
+        """Check for UxPlay when the X server reports window changes."""
+        try:
+            # Replies read by a check can queue more events; loop until idle
+            while self.display.pending_events():
+                changed = False
+                while self.display.pending_events():
+                    event = self.display.next_event()
+                    if event.type in WINDOW_EVENTS or (
+                            event.type == X.PropertyNotify and
+                            event.atom == self._net_client_list):
+                        changed = True
+                if changed:
+                    if not self._check_for_uxplay():
+                        return False
+                    # A new window may get its name shortly; look again soon
+                    self._schedule_watchdog(WATCHDOG_MIN_INTERVAL_MS)
         except Exception:
             pass
 
-        GLib.timeout_add(500, self._check_for_uxplay)
+        return True  # Keep watching
 
     def _check_for_uxplay(self):
         """Check if UxPlay window has appeared."""
-        if not self.display:
+        if not self._root:
             return True
 
         try:
-            root = self.display.screen().root
-            if self._find_uxplay_window(root):
+            if self._find_uxplay_client(self._root):
                 # UxPlay window found, close this dialog
+                for source_id in self._sources:
+                    GLib.source_remove(source_id)
+                self._sources = []
+                if self._watchdog_id is not None:
+                    GLib.source_remove(self._watchdog_id)
+                    self._watchdog_id = None
                 self.destroy()
                 return False
         except Exception:
@@ -86,39 +208,123 @@ class WaitingDialog(Gtk.Window):
 
         return True  # Continue checking
 
-    def _find_uxplay_window(self, window):
-        """Recursively search for UxPlay window."""
-        try:
-            # Check window name
-            wm_name = window.get_wm_name()
-            if wm_name:
-                wm_name_lower = wm_name.lower()
-                for pattern in self.UXPLAY_PATTERNS:
-                    if pattern in wm_name_lower:
-                        return True
-
-            # Check window class (more reliable for identifying apps)
-            wm_class = window.get_wm_class()
-            if wm_class:
-                for cls in wm_class:
-                    if cls:
-                        cls_lower = cls.lower()
-                        for pattern in self.UXPLAY_PATTERNS:
-                            if pattern in cls_lower:
-                                return True
-        except Exception:
-            pass
+    def _find_uxplay_client(self, root):
+        """Search the window manager's client list, or walk the tree without one."""
+        clients = None
+        if self._net_client_list:
+            clients = root.get_full_property(self._net_client_list, X.AnyPropertyType)
+        if not clients:
+            # Not an EWMH window manager
+            return self._find_uxplay_window(root)
 
-        try:
-            children = window.query_tree().children
-            for child in children:
-                if self._find_uxplay_window(child):
+        # Only fetch names for clients not seen since the last refresh
+        cache = self._wm_cache
+        new_ids = [window_id for window_id in clients.value if window_id not in cache]
+        cache.update(zip(new_ids, self._batch_wm_info(new_ids)))
+
+        client_ids = set(clients.value)
+        for window_id in list(cache):
+            if window_id not in client_ids:
+                del cache[window_id]  # Closed since the last check
+
+        for wm_name, wm_class in cache.values():
+            if self._names_match(wm_name, wm_class):
+                return True
+        return False
+
+    def _batch_wm_info(self, window_ids):
+        """Fetch the names and WM_CLASS of many windows with one round trip.
+
+        All GetProperty requests are sent before any reply is read. Returns
+        (wm_name, wm_class) per window as raw bytes, with None where a property
+        is missing. The name is the EWMH _NET_WM_NAME (UTF-8) if set, otherwise WM_NAME.
+        """
+        from Xlib.protocol import request
+
+        atoms = (self._net_wm_name, Xatom.WM_NAME, Xatom.WM_CLASS)
+        requests = []
+        for window_id in window_ids:
+            for atom in atoms:
+                requests.append(request.GetProperty(
+                    display=self.display.display, defer=True, delete=False,
+                    window=window_id, property=atom, type=X.AnyPropertyType,
+                    long_offset=0, long_length=WM_PROPERTY_LENGTH))
+        self.display.flush()
+
+        values = []
+        for req in requests:
+            try:
+                req.reply()
+                fmt, value = req.value
+                values.append(value if fmt == 8 else None)
+            except Exception:
+                # Window went away since the client list was read
+                values.append(None)
+
+        info = []
+        for i in range(0, len(values), 3):
+            net_wm_name, wm_name, wm_class = values[i:i + 3]
+            info.append((net_wm_name or wm_name,
+                         wm_class.split(b'\0') if wm_class else None))
+        return info
+
+    def _names_match(self, wm_name, wm_class):
+        """Check a window's name and class (bytes) against UXPLAY_PATTERNS."""
+        search = self._UXPLAY_RE.search
+
+        # Check window name
+        if wm_name and search(wm_name):
+            return True
+
+        # Check window class (more reliable for identifying apps)
+        if wm_class:
+            for cls in wm_class:
+                if cls and search(cls):
                     return True
-        except Exception:
-            pass
+        return False
+
+    def _find_uxplay_window(self, root):
+        """Breadth-first search of viewable windows, MAX_SEARCH_DEPTH deep."""
+        queue = deque(((root, 0),))
+        while queue:
+            window, depth = queue.popleft()
+            try:
+                # Children come bottom-to-top; a new window is near the top
+                children = self._viewable(window.query_tree().children[::-1])
+            except Exception:
+                continue
+
+            # Names of all the siblings in one round trip
+            for wm_name, wm_class in self._batch_wm_info([child.id for child in children]):
+                if self._names_match(wm_name, wm_class):
+                    return True
+            if depth + 1 < MAX_SEARCH_DEPTH:
+                queue.extend((child, depth + 1) for child in children)
 
         return False
 
+    def _viewable(self, windows):
+        """Return the windows that are mapped and visible, in one round trip.
+
+        Unmapped windows (and everything below them) can't be UxPlay's video.
+        """
+        from Xlib.protocol import request
+
+        requests = [request.GetWindowAttributes(display=self.display.display,
+                                                defer=True, window=window.id)
+                    for window in windows]
+        self.display.flush()
+
+        viewable = []
+        for window, req in zip(windows, requests):
+            try:
+                req.reply()
+                if req.map_state == X.IsViewable:
+                    viewable.append(window)
+            except Exception:
+                pass  # Window went away
+        return viewable
+
 
 def main():
     dialog = WaitingDialog()